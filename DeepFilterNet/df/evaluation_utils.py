@@ -1,11 +1,27 @@
 import csv
 import os
+import threading
 import time
 from abc import ABC, abstractmethod
+from array import array
 from collections import defaultdict, deque
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache, partial
 from multiprocessing.dummy import Pool as DummyPool
-from typing import Callable, Dict, List, Optional, Tuple, Union
+from multiprocessing.shared_memory import SharedMemory
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pystoi
@@ -13,28 +29,75 @@ import torch
 import torch.multiprocessing as mp
 from loguru import logger
 from pesq import pesq
+from scipy.signal import butter, sosfilt
 from torch import Tensor
 from torch.multiprocessing.pool import Pool
-from torchaudio.functional import highpass_biquad
 from torchaudio.transforms import Resample
 
 from df.enhance import df_features
-from df.io import get_resample_params, load_audio, resample, save_audio
+from df.io import get_resample_params, load_audio, save_audio
 from df.model import ModelParams
-from df.scripts.dnsmos import dnsmos_api_req, dnsmos_local, download_onnx_models
+from df.scripts.dnsmos import (
+    HAS_AIOHTTP,
+    URL_P808,
+    URL_P835,
+    DnsMosApiClient,
+    dnsmos_api_req,
+    dnsmos_local,
+    download_onnx_models,
+)
 from df.sepm import composite as composite_py
-from df.utils import as_complex, get_device
+from df.utils import get_device
 from libdf import DF
 
 HAS_OCTAVE = True
 RESAMPLE_METHOD = "sinc_fast"
 
+# (clean, enhanced, noisy, filename)
+Sample = Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[str]]
+# (metric indices, sample index, filename, workers, clean, enhanced, noisy, source sr, target sr)
+MetricJob = Tuple[
+    Tuple[int, ...],
+    int,
+    Optional[str],
+    Tuple[Callable, ...],
+    Any,
+    Any,
+    Any,
+    Optional[int],
+    Optional[int],
+]
+# (sample index, filename, [(metric index, enhanced values, noisy values), ...])
+MetricJobResult = Tuple[int, Optional[str], List[Tuple[int, Any, Any]]]
+# Resampling kernels are shared for all files with the same (orig_sr, new_sr)
+_RESAMPLER_CACHE: Dict[Tuple[int, int], Resample] = {}
+# Kernels of the default eval sampling rates (STOI, PESQ, PESQ-NB) are computed at import
+_PRECOMPUTED_RESAMPLERS = ((48000, 16000), (48000, 10000), (48000, 8000))
+
 try:
     import semetrics
 except (OSError, ImportError, ModuleNotFoundError):
     HAS_OCTAVE = False
     semetrics = None
 
+try:
+    import pandas as pd
+
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+    pd = None
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda f: f
+
 
 def log_progress(iterable, total: Optional[int] = None, log_freq_percent=25, desc="Progress"):
     disable_logging = log_freq_percent < 0 or log_freq_percent >= 100
@@ -57,6 +120,123 @@ def log_progress(iterable, total: Optional[int] = None, log_freq_percent=25, des
                 logged.add(progress)
 
 
+def _get_resampler(orig_sr: int, new_sr: int) -> Resample:
+    key = (orig_sr, new_sr)
+    if key not in _RESAMPLER_CACHE:
+        _RESAMPLER_CACHE[key] = Resample(orig_sr, new_sr, **get_resample_params(RESAMPLE_METHOD))
+    return _RESAMPLER_CACHE[key]
+
+
+for _orig_sr, _new_sr in _PRECOMPUTED_RESAMPLERS:
+    _get_resampler(_orig_sr, _new_sr)
+
+
+def _resample(audio: Union[np.ndarray, Tensor], orig_sr: int, new_sr: int) -> Tensor:
+    """Same as `df.io.resample()` using a cached resampling kernel."""
+    resampler = _get_resampler(orig_sr, new_sr)
+    return resampler.forward(torch.as_tensor(audio).to(resampler.kernel.dtype))
+
+
+def load_audio_resampled(file: str, sr: int) -> Tensor:
+    """Loads an audio file at its native sampling rate and resamples it in memory to `sr`.
+
+    In contrast to `df.io.load_audio(file, sr)`, the resampling kernel is only computed once
+    per sampling rate pair.
+    """
+    audio, info = load_audio(file, None)
+    if info.sample_rate != sr:
+        audio = _resample(audio, info.sample_rate, sr)
+    return audio
+
+
+def prefetch(
+    loaders: Tuple[Callable[[str], Any], ...], files: Iterable[Tuple[str, ...]]
+) -> Iterator[Tuple[Any, ...]]:
+    """Loads tuples of files, e.g. `(noisy, clean)`, one item ahead in background threads.
+
+    Each file of a tuple is loaded via the corresponding loader, e.g. `load_audio_resampled`.
+    This hides the disk I/O and resampling behind the processing of the current item.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+
+        def submit(fns):
+            if fns is None:
+                return None
+            return [executor.submit(load, fn) for load, fn in zip(loaders, fns)]
+
+        it = iter(files)
+        pending = submit(next(it, None))
+        while pending is not None:
+            current = pending
+            pending = submit(next(it, None))
+            yield tuple(f.result() for f in current)
+
+
+def new_df_state_like(df_state: DF) -> DF:
+    """Returns a new DF state with the same parameters as `df_state`."""
+    return DF(
+        sr=df_state.sr(),
+        fft_size=df_state.fft_size(),
+        hop_size=df_state.hop_size(),
+        nb_bands=df_state.nb_erb(),
+    )
+
+
+class StftRoundTrip:
+    """Computes `df_state.synthesis(df_state.analysis(x))` without the STFT/ISTFT if possible.
+
+    The round trip is used to apply the same delay and edge effects to the reference signals as
+    the enhanced signal has. Since the real-time STFT loop is linear with a fixed window, the
+    round trip is equal to a delay of `fft_size - hop_size` samples and a per sample gain, which
+    is periodic with the hop size. Both are estimated once and verified against the actual round
+    trip. If the verification fails, the actual round trip is used.
+
+    Args:
+        df_state (DF): DF state defining the STFT parameters. Should not be used concurrently.
+    """
+
+    def __init__(self, df_state: DF):
+        self.df_state = df_state
+        self.hop = df_state.hop_size()
+        self.lock = threading.Lock()
+        n_fft = df_state.fft_size()
+        n = (4 * n_fft // self.hop + 2) * self.hop
+        impulse = np.zeros((1, n), dtype=np.float32)
+        impulse[0, n_fft] = 1
+        self.delay = int(np.argmax(np.abs(self._exact(impulse)[0]))) - n_fft
+        # Gain of one hop, indexed by output sample index modulo hop
+        self.gain_period = self._exact(np.ones((1, n), dtype=np.float32))[0, n - self.hop :]
+        self._gain = lru_cache(maxsize=16)(self._tile_gain)
+        x = np.random.default_rng(0).standard_normal((1, n)).astype(np.float32)
+        self.is_linear = self.delay >= 0 and np.allclose(
+            self._replay(x), self._exact(x), rtol=1e-4, atol=1e-5
+        )
+        if not self.is_linear:
+            logger.debug("STFT round trip could not be replayed, using analysis/synthesis.")
+
+    def _exact(self, x: np.ndarray) -> np.ndarray:
+        with self.lock:
+            return self.df_state.synthesis(self.df_state.analysis(x))
+
+    def _tile_gain(self, n: int) -> np.ndarray:
+        return np.tile(self.gain_period, n // self.hop)
+
+    def _replay(self, x: np.ndarray) -> np.ndarray:
+        n_out = x.shape[-1] // self.hop * self.hop  # Analysis only processes full hops
+        d = self.delay
+        y = np.zeros((x.shape[0], n_out), dtype=np.float32)
+        if n_out > d:
+            y[:, d:] = x[:, : n_out - d] * self._gain(n_out)[d:]
+        return y
+
+    def __call__(self, x: Union[np.ndarray, Tensor]) -> np.ndarray:
+        """Round trip of `x` with shape [C, T]."""
+        x = np.ascontiguousarray(as_numpy(x), dtype=np.float32)
+        if self.is_linear:
+            return self._replay(x)
+        return self._exact(x)
+
+
 @torch.no_grad()
 def enhance(model, df_state: DF, noisy: Tensor, f_hp_cutoff: Optional[int] = None):
     model.eval()
@@ -64,15 +244,23 @@ def enhance(model, df_state: DF, noisy: Tensor, f_hp_cutoff: Optional[int] = Non
         model.reset_h0(batch_size=1, device=get_device())
     nb_df = getattr(model, "nb_df", getattr(model, "df_bins", ModelParams().nb_df))
     spec, erb_feat, spec_feat = df_features(noisy, df_state, nb_df, device=get_device())
-    spec = model(spec, erb_feat, spec_feat)[0].squeeze(0)  # [C, T, F, 2]
-    audio = df_state.synthesis(as_complex(spec).cpu().numpy())
+    spec = model(spec, erb_feat, spec_feat)[0].squeeze(0).to(torch.float32)  # [C, T, F, 2]
+    # One contiguous host buffer, viewed as complex64 [C, T, F] without another copy
+    spec_np = spec.cpu().contiguous().numpy()
+    audio = df_state.synthesis(spec_np.view(np.complex64).reshape(spec_np.shape[:-1]))
     if f_hp_cutoff is not None:
-        audio = highpass_biquad(
-            torch.from_numpy(audio), df_state.sr(), cutoff_freq=f_hp_cutoff
-        ).numpy()
+        audio = sosfilt(_highpass_sos(df_state.sr(), f_hp_cutoff), audio)
+        # Clamp like torchaudio's highpass_biquad
+        audio = np.clip(audio, -1.0, 1.0).astype(np.float32, copy=False)
     return audio
 
 
+@lru_cache(maxsize=None)
+def _highpass_sos(sr: int, cutoff_freq: float) -> np.ndarray:
+    # 2nd order butterworth, i.e. the same as a biquad with Q=1/sqrt(2)
+    return butter(2, cutoff_freq / (sr / 2), btype="highpass", output="sos")
+
+
 def get_metrics(sr: int):
     return {
         "stoi": partial(StoiMetric, sr=sr),
@@ -97,48 +285,57 @@ def evaluation_loop(
     csv_path_noisy: Optional[str] = None,
     noisy_metric: bool = False,
     sleep_ms=0,
+    chunksize: int = 4,
 ) -> Dict[str, float]:
     sr = df_state.sr()
     if n_workers >= 1:
         ctx = mp.get_context("spawn")
-        pool_fn = ctx.Pool
+        pool_fn = partial(ctx.Pool, initializer=init_metric_worker)
     else:
         pool_fn = DummyPool
     metrics_dict = get_metrics(sr)
     with pool_fn(processes=max(1, n_workers)) as pool:
-        metrics: List[Metric] = [metrics_dict[m.lower()](pool=pool) for m in metrics]
-        for noisyfn, cleanfn in log_progress(
-            zip(noisy_files, clean_files), len(noisy_files), log_percent
-        ):
-            noisy, _ = load_audio(noisyfn, sr, method=RESAMPLE_METHOD)
-            clean, _ = load_audio(cleanfn, sr, method=RESAMPLE_METHOD)
-            logger.debug(f"Processing {os.path.basename(noisyfn)}, {os.path.basename(cleanfn)}")
-            enh = enhance(model, df_state, noisy)[0]
-            clean = df_state.synthesis(df_state.analysis(clean.numpy()))[0]
-            if noisy_metric:
-                noisy = df_state.synthesis(df_state.analysis(noisy.numpy()))[0]
-            else:
-                noisy = None
-            for m in metrics:
-                m.add(clean=clean, enhanced=enh, noisy=noisy, fn=os.path.basename(noisyfn))
-            if save_audio_callback is not None:
-                enh = torch.as_tensor(enh).to(torch.float32).view(1, -1)
-                save_audio_callback(cleanfn, enh)
-            if sleep_ms > 0:
-                time.sleep(sleep_ms / 1000)
-        logger.info("Waiting for metrics computation completion. This could take a few minutes.")
-        if csv_path_enh is not None:
-            enh = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend().items():
-                    enh[fn] = {**enh[fn], **values}
-            write_csv(csv_path_enh, enh)
-        if csv_path_noisy is not None:
-            noisy = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend(noisy=True).items():
-                    noisy[fn] = {**noisy[fn], **values}
-            write_csv(csv_path_noisy, noisy)
+        metrics: List[MPMetric] = [metrics_dict[m.lower()](pool=pool) for m in metrics]
+        # The clean files are processed within the prefetch threads, thus use a separate state
+        round_trip = StftRoundTrip(new_df_state_like(df_state))
+
+        @lru_cache(maxsize=256)
+        def load_clean(cleanfn: str) -> np.ndarray:
+            # Test sets often contain multiple noisy versions of the same clean file
+            return as_contiguous_f32(round_trip(load_audio_resampled(cleanfn, sr))[0])
+
+        def samples() -> Iterator[Sample]:
+            for (noisyfn, cleanfn), (noisy, clean) in zip(
+                log_progress(zip(noisy_files, clean_files), len(noisy_files), log_percent),
+                prefetch(
+                    (partial(load_audio_resampled, sr=sr), load_clean),
+                    zip(noisy_files, clean_files),
+                ),
+            ):
+                logger.debug(f"Processing {os.path.basename(noisyfn)}, {os.path.basename(cleanfn)}")
+                enh = as_contiguous_f32(enhance(model, df_state, noisy)[0])
+                if noisy_metric:
+                    noisy = as_contiguous_f32(round_trip(noisy)[0])
+                else:
+                    noisy = None
+                yield clean, enh, noisy, os.path.basename(noisyfn)
+                if save_audio_callback is not None:
+                    enh = torch.as_tensor(enh).to(torch.float32).view(1, -1)
+                    save_audio_callback(cleanfn, enh)
+                if sleep_ms > 0:
+                    time.sleep(sleep_ms / 1000)
+
+        compute_metrics(
+            pool,
+            metrics,
+            samples(),
+            use_shared_memory=n_workers >= 1,
+            chunksize=chunksize,
+            max_pending_samples=4 * max(1, n_workers),
+            csv_path_enh=csv_path_enh,
+            csv_path_noisy=csv_path_noisy if noisy_metric else None,
+        )
+        logger.debug(f"Clean file cache: {load_clean.cache_info()}")
         out_dict = {}
         for m in metrics:
             for k, v in m.mean().items():
@@ -155,46 +352,46 @@ def evaluation_loop_dir_only(
     log_percent: int = 25,
     csv_path_enh: Optional[str] = None,
     csv_path_noisy: Optional[str] = None,
+    chunksize: int = 16,
 ) -> Dict[str, float]:
     sr = 16_000
     if n_workers >= 1:
         ctx = mp.get_context("spawn")
-        pool_fn = ctx.Pool
+        pool_fn = partial(ctx.Pool, initializer=init_metric_worker)
     else:
         pool_fn = DummyPool
     metrics_dict = get_metrics(sr)
     with pool_fn(processes=max(1, n_workers)) as pool:
-        metrics: List[Metric] = [metrics_dict[m.lower()](pool=pool) for m in metrics]
+        metrics: List[MPMetric] = [metrics_dict[m.lower()](pool=pool) for m in metrics]
         if noisy_files is None or len(noisy_files) == 0:
             noisy_files = [None] * len(clean_files)
         assert len(enh_files) == len(clean_files)
         assert len(noisy_files) == len(clean_files)
-        noisy = None
-        for cleanfn, enhfn, noisyfn in log_progress(
-            zip(clean_files, enh_files, noisy_files), len(noisy_files), log_percent
-        ):
-            clean, _ = load_audio(cleanfn, sr, method=RESAMPLE_METHOD)
-            enh, _ = load_audio(enhfn, sr, method=RESAMPLE_METHOD)
-            logger.debug(f"Processing clean {cleanfn}")
-            logger.debug(f"Processing enh {enhfn}")
-            if noisyfn is not None:
-                noisy, _ = load_audio(noisyfn, sr, method=RESAMPLE_METHOD)
-                logger.debug(f"Processing noisy {noisyfn}")
-            for m in metrics:
-                m.add(clean=clean, enhanced=enh, noisy=noisy, fn=os.path.basename(cleanfn))
-        logger.info("Waiting for metrics computation completion. This could take a few minutes.")
-        if csv_path_enh is not None:
-            enh = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend().items():
-                    enh[fn] = {**enh[fn], **values}
-            write_csv(csv_path_enh, enh)
-        if csv_path_noisy is not None:
-            noisy = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend(noisy=True).items():
-                    noisy[fn] = {**noisy[fn], **values}
-            write_csv(csv_path_noisy, noisy)
+
+        def samples() -> Iterator[Sample]:
+            noisy = None
+            for cleanfn, enhfn, noisyfn in log_progress(
+                zip(clean_files, enh_files, noisy_files), len(noisy_files), log_percent
+            ):
+                clean = as_contiguous_f32(load_audio_resampled(cleanfn, sr))
+                enh = as_contiguous_f32(load_audio_resampled(enhfn, sr))
+                logger.debug(f"Processing clean {cleanfn}")
+                logger.debug(f"Processing enh {enhfn}")
+                if noisyfn is not None:
+                    noisy = as_contiguous_f32(load_audio_resampled(noisyfn, sr))
+                    logger.debug(f"Processing noisy {noisyfn}")
+                yield clean, enh, noisy, os.path.basename(cleanfn)
+
+        compute_metrics(
+            pool,
+            metrics,
+            samples(),
+            use_shared_memory=n_workers >= 1,
+            chunksize=chunksize,
+            max_pending_samples=4 * max(1, n_workers),
+            csv_path_enh=csv_path_enh,
+            csv_path_noisy=csv_path_noisy,
+        )
         out_dict = {}
         for m in metrics:
             for k, v in m.mean().items():
@@ -202,6 +399,69 @@ def evaluation_loop_dir_only(
         return out_dict
 
 
+def compute_metrics(
+    pool: Pool,
+    metrics: List["MPMetric"],
+    samples: Iterable[Sample],
+    use_shared_memory: bool = False,
+    chunksize: int = 4,
+    csv_path_enh: Optional[str] = None,
+    csv_path_noisy: Optional[str] = None,
+    max_pending_samples: int = 16,
+):
+    """Computes all metrics for all samples using `pool.imap_unordered()`.
+
+    Args:
+        pool (Pool): Worker pool. Should be the pool of `metrics`.
+        metrics (list): Metrics to compute. Results are added to their values.
+        samples (Iterable): Tuples of `(clean, enhanced, noisy, filename)`. The samples are
+            consumed by the pool's task handler thread, i.e. producing the next samples (e.g.
+            enhancement or loading of audio files) overlaps with the metric computation.
+        use_shared_memory (bool): Pass the inputs to the workers via shared memory. Only useful
+            for worker processes.
+        chunksize (int): Number of jobs sent to a worker at once.
+        csv_path_enh (str): Optional path to write the enhanced metrics per file.
+        csv_path_noisy (str): Optional path to write the noisy metrics per file.
+        max_pending_samples (int): Maximum number of samples kept in shared memory. At least
+            `chunksize + 1`, since the jobs of a partially filled chunk are not dispatched yet.
+    """
+    with ExitStack() as stack:
+        csv_enh, csv_noisy = None, None
+        if csv_path_enh is not None:
+            csv_enh = stack.enter_context(StreamingCsvWriter(csv_path_enh, metrics))
+        if csv_path_noisy is not None:
+            csv_noisy = stack.enter_context(StreamingCsvWriter(csv_path_noisy, metrics))
+        # Waveforms are passed to worker processes via shared memory instead of pickling
+        shared = None
+        if use_shared_memory:
+            max_pending = max(max_pending_samples, chunksize + 1)
+            shared = stack.enter_context(SharedArrays(max_pending=max_pending))
+
+        def jobs() -> Iterator[MetricJob]:
+            # Filenames are not unique, e.g. when evaluating multiple versions of the same clean
+            # file. Thus, the results of a sample are identified by its index.
+            for sample_idx, (clean, enh, noisy, fn) in enumerate(samples):
+                file_jobs = metric_jobs(metrics, clean, enh, noisy, fn=fn, sample_idx=sample_idx)
+                if shared is not None:
+                    file_jobs = shared.share_jobs(list(file_jobs))
+                yield from file_jobs
+
+        for sample_idx, fn, results in pool.imap_unordered(
+            run_metric_job, jobs(), chunksize=chunksize
+        ):
+            if shared is not None:
+                shared.job_done(sample_idx)
+            for idx, values_enh, values_noisy in results:
+                metrics[idx].add_result(values_enh, fn)
+                if csv_enh is not None:
+                    csv_enh.add(metrics[idx], values_enh, sample_idx, fn)
+                if values_noisy is None:
+                    continue
+                metrics[idx].add_result(values_noisy, fn, noisy=True)
+                if csv_noisy is not None:
+                    csv_noisy.add(metrics[idx], values_noisy, sample_idx, fn)
+
+
 def evaluation_loop_dns(
     df_state: DF,
     model,
@@ -214,20 +474,28 @@ def evaluation_loop_dns(
     csv_path_enh: Optional[str] = None,
     csv_path_noisy: Optional[str] = None,
     assert_output_length: Optional[int] = None,
+    n_concurrent_requests: int = 64,
+    legacy_csv: bool = False,
 ) -> Dict[str, float]:
     sr = df_state.sr()
-    metrics_dict = {
-        "p808": partial(DnsMosP808ApiMetric, sr=sr),
-        "p835": partial(DnsMosP835ApiMetric, sr=sr),
-        "p835_local": partial(DnsMosP835LocalMetric, sr=sr),
-    }
-    with DummyPool(processes=max(1, n_workers)) as pool:
+    # API requests are sent asynchronously if possible instead of one request per pool worker
+    use_api_client = HAS_AIOHTTP and any(m.lower() in ("p808", "p835") for m in metrics)
+    with DummyPool(processes=max(1, n_workers)) as pool, ExitStack() as stack:
+        api_client = None
+        if use_api_client:
+            api_client = stack.enter_context(DnsMosApiClient(n_concurrent_requests))
+        metrics_dict = {
+            "p808": partial(DnsMosP808ApiMetric, sr=sr, api_client=api_client),
+            "p835": partial(DnsMosP835ApiMetric, sr=sr, api_client=api_client),
+            "p835_local": partial(DnsMosP835LocalMetric, sr=sr),
+        }
         metrics: List[NoisyMetric] = [metrics_dict[m.lower()](pool=pool) for m in metrics]
+        round_trip = StftRoundTrip(new_df_state_like(df_state))
         for noisyfn in log_progress(noisy_files, len(noisy_files), log_percent):
-            noisy, _ = load_audio(noisyfn, sr, method=RESAMPLE_METHOD)
+            noisy = load_audio_resampled(noisyfn, sr)
             logger.debug(f"Processing {os.path.basename(noisyfn)}")
             enh = enhance(model, df_state, noisy)[0]
-            noisy = df_state.synthesis(df_state.analysis(noisy.numpy()))[0]
+            noisy = round_trip(noisy)[0]
             for m in metrics:
                 m.add(
                     enhanced=enh, noisy=noisy if eval_noisy else None, fn=os.path.basename(noisyfn)
@@ -237,17 +505,9 @@ def evaluation_loop_dns(
                 save_audio_callback(noisyfn, enh)
         logger.info("Waiting for metrics computation completion. This could take a few minutes.")
         if csv_path_enh is not None:
-            enh = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend().items():
-                    enh[fn] = {**enh[fn], **values}
-            write_csv(csv_path_enh, enh)
+            write_metrics_csv(csv_path_enh, metrics, legacy=legacy_csv)
         if eval_noisy and csv_path_noisy is not None:
-            noisy = defaultdict(dict)  # {filename: {metric_name: metric_value}}
-            for m in metrics:
-                for fn, values in m.flattend(noisy=True).items():
-                    noisy[fn] = {**noisy[fn], **values}
-            write_csv(csv_path_noisy, noisy)
+            write_metrics_csv(csv_path_noisy, metrics, noisy=True, legacy=legacy_csv)
         out_dict = {}
         for m in metrics:
             if assert_output_length is not None:
@@ -257,6 +517,173 @@ def evaluation_loop_dns(
         return out_dict
 
 
+def metric_jobs(
+    metrics: List["MPMetric"],
+    clean,
+    enhanced,
+    noisy=None,
+    fn: Optional[str] = None,
+    sample_idx: int = 0,
+) -> Iterator[MetricJob]:
+    """Yields jobs to be computed via `run_metric_job()` for one sample and all metrics.
+
+    The inputs are not resampled here, but within the worker. Thus, all jobs of a sample share
+    the same input arrays. Metrics with the same sampling rates are computed in the same job,
+    so that the inputs are resampled only once per target sampling rate.
+    """
+    assert clean.shape == enhanced.shape, f"{clean.shape}, {enhanced.shape}, {fn}"
+    if noisy is not None:
+        assert clean.shape == noisy.shape, f"{clean.shape}, {noisy.shape}, {fn}"
+    clean, enhanced = as_contiguous_f32(clean), as_contiguous_f32(enhanced)
+    if noisy is not None:
+        noisy = as_contiguous_f32(noisy)
+    groups: Dict[Tuple[Optional[int], Optional[int]], List[int]] = defaultdict(list)
+    for idx, m in enumerate(metrics):
+        src_sr, dst_sr = (m.source_sr, m.sr) if m.resampler is not None else (None, None)
+        groups[(src_sr, dst_sr)].append(idx)
+    for (src_sr, dst_sr), indices in groups.items():
+        workers = tuple(metrics[idx].worker for idx in indices)
+        yield tuple(indices), sample_idx, fn, workers, clean, enhanced, noisy, src_sr, dst_sr
+
+
+def init_metric_worker():
+    # Metric worker processes run in parallel, thus avoid oversubscription by torch ops
+    torch.set_num_threads(1)
+
+
+def run_metric_job(job: MetricJob) -> MetricJobResult:
+    """Computes a metric job. Exceptions are returned and logged by `MPMetric.add_result()`.
+
+    The noisy values are `None` if the job has no noisy input.
+
+    Inputs may be passed as `SharedArray` handles which are attached for the job duration. If
+    a source and target sampling rate is provided, the inputs are resampled within the worker
+    using a per process cached resampling kernel.
+    """
+    indices, sample_idx, fn, workers, clean, enhanced, noisy, src_sr, dst_sr = job
+    blocks: List[SharedMemory] = []
+    try:
+        clean, enhanced, noisy = (
+            x.attach(blocks) if isinstance(x, SharedArray) else x for x in (clean, enhanced, noisy)
+        )
+        if src_sr is not None and dst_sr is not None:
+            clean, enhanced, noisy = (
+                _resample(x, src_sr, dst_sr).numpy() if x is not None else None
+                for x in (clean, enhanced, noisy)
+            )
+        results = []
+        for idx, worker in zip(indices, workers):
+            values_enh = _run_worker(worker, clean, enhanced)
+            values_noisy = _run_worker(worker, clean, noisy) if noisy is not None else None
+            results.append((idx, values_enh, values_noisy))
+    except Exception as e:
+        results = [(idx, e, e if noisy is not None else None) for idx in indices]
+    finally:
+        # Views into the shared buffers need to be released before closing
+        del clean, enhanced, noisy
+        for shm in blocks:
+            shm.close()
+    return sample_idx, fn, results
+
+
+def _run_worker(worker: Callable, clean: np.ndarray, degraded: np.ndarray) -> Any:
+    try:
+        return worker(clean, degraded)
+    except Exception as e:
+        return e
+
+
+class SharedArray(NamedTuple):
+    """Handle of a numpy array stored in a `SharedMemory` block."""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    def attach(self, blocks: List[SharedMemory]) -> np.ndarray:
+        """Returns a view of the shared array. The opened block is appended to `blocks`."""
+        shm = SharedMemory(name=self.name)
+        blocks.append(shm)
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+
+class SharedArrays:
+    """Manages the shared memory blocks of the metric jobs.
+
+    The input arrays of all jobs of a sample are copied once into shared memory. The blocks are
+    unlinked once all jobs of this sample are done, or at the latest when exiting the context.
+
+    Args:
+        max_pending (int): Maximum number of samples with unfinished jobs. `share_jobs()` blocks
+            until a sample is done if this number is exceeded, so that the shared memory does not
+            grow with the dataset size.
+    """
+
+    def __init__(self, max_pending: Optional[int] = None):
+        self.max_pending = max_pending
+        self.blocks: Dict[int, List[SharedMemory]] = defaultdict(list)
+        self.pending: Dict[int, int] = defaultdict(int)
+        self.closed = False
+        # Jobs are produced by the pool's task handler thread and finished on the main thread
+        self.lock = threading.Condition()
+
+    def _has_capacity(self) -> bool:
+        return self.closed or self.max_pending is None or len(self.pending) < self.max_pending
+
+    def _share(self, arr: np.ndarray, sample_idx: int) -> SharedArray:
+        shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        self.blocks[sample_idx].append(shm)
+        return SharedArray(shm.name, arr.shape, arr.dtype.str)
+
+    def share_jobs(self, jobs: List[MetricJob]) -> List[MetricJob]:
+        """Replaces the input arrays of `jobs`, all belonging to the same sample, by handles."""
+        shared: Dict[int, SharedArray] = {}  # Inputs are shared between jobs; {id(arr): handle}
+        out = []
+        if len(jobs) == 0:
+            return out
+        with self.lock:
+            self.lock.wait_for(self._has_capacity)
+            if self.closed:
+                raise RuntimeError("SharedArrays is already closed")
+            for indices, sample_idx, fn, workers, clean, enhanced, noisy, src_sr, dst_sr in jobs:
+                inputs = []
+                for x in (clean, enhanced, noisy):
+                    if x is not None and id(x) not in shared:
+                        shared[id(x)] = self._share(x, sample_idx)
+                    inputs.append(shared[id(x)] if x is not None else None)
+                out.append((indices, sample_idx, fn, workers, *inputs, src_sr, dst_sr))
+                self.pending[sample_idx] += 1
+        return out
+
+    def job_done(self, sample_idx: int):
+        with self.lock:
+            self.pending[sample_idx] -= 1
+            if self.pending[sample_idx] == 0:
+                del self.pending[sample_idx]
+                self._unlink(self.blocks.pop(sample_idx, []))
+                self.lock.notify_all()
+
+    @staticmethod
+    def _unlink(blocks: List[SharedMemory]):
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        with self.lock:
+            for blocks in self.blocks.values():
+                self._unlink(blocks)
+            self.blocks.clear()
+            self.pending.clear()
+            # Wake up a producer waiting in `share_jobs()`, e.g. after an error on the main thread
+            self.closed = True
+            self.lock.notify_all()
+
+
 def write_csv(path: str, flat_metrics: Dict[str, Dict[str, float]]):
     """Write metrics to a csv file of format file_name,metric_a,metric_b,...
 
@@ -272,6 +699,129 @@ def write_csv(path: str, flat_metrics: Dict[str, Dict[str, float]]):
             csvwriter.writerow([fn] + [str(m[n]) for n in metric_names])
 
 
+def write_metrics_csv(
+    path: str, metrics: List["Metric"], noisy: bool = False, legacy: bool = False
+):
+    """Write the values of all metrics to a csv file of format file_name,metric_a,metric_b,...
+
+    If pandas is available, the values are joined into a single DataFrame and written via
+    `DataFrame.to_csv()`. Otherwise, or if `legacy` is set, `write_csv()` is used.
+
+    Args:
+        path (str): Path to csv file to write. Will be overwritten if existing.
+        metrics (list): Metrics that computed the values.
+        noisy (bool): Write the values of the noisy instead of the enhanced signals.
+        legacy (bool): Use `write_csv()` also if pandas is available.
+    """
+    if legacy or not HAS_PANDAS:
+        flat: Dict[str, Dict[str, float]] = defaultdict(dict)  # {filename: {metric_name: value}}
+        for m in metrics:
+            for fn, values in m.flattend(noisy=noisy).items():
+                flat[fn].update(values)
+        write_csv(path, flat)
+        return
+    frame = pd.concat([m.to_frame(noisy=noisy) for m in metrics], axis=1, sort=False)
+    # Metrics may share names (e.g. p835 and p835_local). As in `write_csv()`, the last one wins.
+    frame = frame.loc[:, ~frame.columns.duplicated(keep="last")]
+    frame.to_csv(path, index_label="filename")
+
+
+class StreamingCsvWriter:
+    """Writes metrics to a csv file of format file_name,metric_a,metric_b,...
+
+    In contrast to `write_csv()`, a row is written as soon as all metrics reported their values
+    of the corresponding sample. Thus, only the values of samples with pending metrics are kept.
+    Samples are identified by an index, since multiple samples may share the same file name.
+    If multiple metrics report a value of the same name, the value of the last metric is written.
+
+    Args:
+        path (str): Path to csv file to write. Will be overwritten if existing.
+        metrics (list): All metrics that will report values for each file.
+    """
+
+    def __init__(self, path: str, metrics: List["Metric"]):
+        self.path = path
+        self.n_metrics = len(metrics)
+        self.metric_names = list(dict.fromkeys(n for m in metrics for n in m.enh_values.keys()))
+        self.metric_indices = {id(m): i for i, m in enumerate(metrics)}
+        # {sample index: {metric index: {metric name: value}}}
+        self.rows: Dict[int, Dict[int, Dict[str, float]]] = defaultdict(dict)
+        self.counts: Dict[int, int] = defaultdict(int)
+        self.filenames: Dict[int, str] = {}
+        self.csvfile = None
+        self.csvwriter = None
+
+    def __enter__(self):
+        self.csvfile = open(self.path, mode="w", newline="")
+        self.csvwriter = csv.writer(self.csvfile, delimiter=",", quoting=csv.QUOTE_MINIMAL)
+        self.csvwriter.writerow(["filename"] + self.metric_names)
+        return self
+
+    def __exit__(self, *args):
+        # Flush rows of samples where some metric failed
+        for sample_idx in list(self.counts.keys()):
+            self._write_row(sample_idx)
+        assert self.csvfile is not None
+        self.csvfile.close()
+
+    def add(self, metric: "Metric", values: Any, sample_idx: int, fn: Optional[str] = None):
+        """Add the values of one metric for a sample and write the row if it is complete.
+
+        Args:
+            metric (Metric): Metric that computed `values`.
+            values: Metric values or the exception raised while computing them.
+            sample_idx (int): Index of the sample the values belong to.
+            fn (str): File name of the sample which is written as label of the row.
+        """
+        self.filenames[sample_idx] = fn or ""
+        if not isinstance(values, Exception):
+            values = dict(zip(metric.enh_values.keys(), np.atleast_1d(values)))
+            self.rows[sample_idx][self.metric_indices[id(metric)]] = values
+        self.counts[sample_idx] += 1
+        if self.counts[sample_idx] == self.n_metrics:
+            self._write_row(sample_idx)
+
+    def _write_row(self, sample_idx: int):
+        assert self.csvwriter is not None
+        # Results arrive in completion order, thus merge them in metric order
+        m: Dict[str, float] = {}
+        for _, values in sorted(self.rows.pop(sample_idx, {}).items()):
+            m.update(values)
+        self.counts.pop(sample_idx, None)
+        fn = self.filenames.pop(sample_idx, "")
+        self.csvwriter.writerow([fn] + [str(m.get(n, "")) for n in self.metric_names])
+
+
+class MetricValues:
+    """Values of one metric stored as a list of file names and a float64 array of values."""
+
+    __slots__ = ("filenames", "values")
+
+    def __init__(self):
+        self.filenames: List[Optional[str]] = []
+        self.values = array("d")
+
+    def append(self, fn: Optional[str], value: float):
+        self.filenames.append(fn)
+        self.values.append(float(value))
+
+    def mean(self) -> float:
+        if len(self.values) == 0:
+            return float("nan")
+        # A buffer view blocks `append()` while alive, thus only use it temporarily
+        return float(np.frombuffer(self.values, dtype=np.float64).mean())
+
+    def as_array(self) -> np.ndarray:
+        """Returns a float64 copy of the values."""
+        return np.array(self.values, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], float]]:
+        return zip(self.filenames, self.values)
+
+
 class Metric(ABC):
     def __init__(
         self,
@@ -281,17 +831,18 @@ class Metric(ABC):
         device="cpu",
     ):
         self.name = name
+        self.source_sr = source_sr
         self.sr = target_sr
         self.resampler = None
         if source_sr is not None and target_sr is not None and source_sr != target_sr:
-            params = get_resample_params(RESAMPLE_METHOD)
-            self.resampler = Resample(source_sr, target_sr, **params).to(device)
-        self.enh_values: Dict[str, List[Tuple[Optional[str], float]]] = (
-            {name: []} if isinstance(name, str) else {n: [] for n in name}
-        )
-        self.noisy_values: Dict[str, List[Tuple[Optional[str], float]]] = (
-            {name: []} if isinstance(name, str) else {n: [] for n in name}
-        )
+            if device == "cpu":
+                self.resampler = _get_resampler(source_sr, target_sr)
+            else:
+                params = get_resample_params(RESAMPLE_METHOD)
+                self.resampler = Resample(source_sr, target_sr, **params).to(device)
+        names = [name] if isinstance(name, str) else name
+        self.enh_values: Dict[str, MetricValues] = {n: MetricValues() for n in names}
+        self.noisy_values: Dict[str, MetricValues] = {n: MetricValues() for n in names}
 
     @abstractmethod
     def compute_metric(self, clean, degraded) -> Union[float, np.ndarray]:
@@ -301,28 +852,32 @@ class Metric(ABC):
         if isinstance(values_enh, float):
             values_enh = np.asarray([values_enh])
         for k, v in zip(self.enh_values.keys(), values_enh):
-            self.enh_values[k].append((fn, v))
+            self.enh_values[k].append(fn, v)
 
     def _add_values_noisy(self, values_noisy: Union[float, np.ndarray], fn: Optional[str] = None):
         if isinstance(values_noisy, float):
             values_noisy = np.asarray([values_noisy])
         for k, v in zip(self.noisy_values.keys(), values_noisy):
-            self.noisy_values[k].append((fn, v))
+            self.noisy_values[k].append(fn, v)
 
-    def maybe_resample(self, x) -> Tensor:
-        if self.resampler is not None:
-            x = self.resampler.forward(torch.as_tensor(x).clone())
-        return x
+    def maybe_resample(self, x: Union[np.ndarray, Tensor]) -> Union[np.ndarray, Tensor]:
+        """Resamples `x` to `self.sr` if necessary. Numpy arrays are resampled via a tensor view."""
+        if self.resampler is None:
+            return x
+        if isinstance(x, np.ndarray):
+            return self.resampler.forward(torch.from_numpy(x)).numpy()
+        return self.resampler.forward(torch.as_tensor(x).clone())
 
     def add(self, clean, enhanced, noisy=None, fn: Optional[str] = None):
         assert clean.shape == enhanced.shape, f"{clean.shape}, {enhanced.shape}, {fn}"
-        clean = self.maybe_resample(clean).squeeze(0)
-        enhanced = self.maybe_resample(enhanced).squeeze(0)
+        if noisy is not None:
+            assert clean.shape == noisy.shape, f"{clean.shape}, {noisy.shape}, {fn}"
+        clean = self.maybe_resample(as_contiguous_f32(clean))
+        enhanced = self.maybe_resample(as_contiguous_f32(enhanced))
         values_enh = self.compute_metric(clean=clean, degraded=enhanced)
         self._add_values_enh(values_enh, fn)
         if noisy is not None:
-            assert clean.shape == noisy.shape, f"{clean.shape}, {noisy.shape}, {fn}"
-            noisy = self.maybe_resample(noisy).squeeze(0)
+            noisy = self.maybe_resample(as_contiguous_f32(noisy))
             values_noisy = self.compute_metric(clean=clean, degraded=noisy)
             self._add_values_noisy(values_noisy, fn)
 
@@ -330,24 +885,29 @@ class Metric(ABC):
         out = {}
         for n in self.enh_values.keys():
             if n in self.noisy_values and len(self.noisy_values[n]) > 0:
-                out[f"Noisy    {n}"] = np.mean([v[1] for v in self.noisy_values[n]])
-            out[f"Enhanced {n}"] = np.mean([v[1] for v in self.enh_values[n]])
+                out[f"Noisy    {n}"] = self.noisy_values[n].mean()
+            out[f"Enhanced {n}"] = self.enh_values[n].mean()
         return out
 
     def flattend(self, noisy: bool = False) -> Dict[str, Dict[str, float]]:
         """{filename: {metric_name: metric_value}}"""
-        enh_flat = defaultdict(dict)
-        noisy_flat = defaultdict(dict)
-        names = list(self.enh_values.keys())
-        for n in names:
-            if n in self.noisy_values and len(self.noisy_values[n]) > 0:
-                for fn, v in self.noisy_values[n]:
-                    noisy_flat[fn or ""][n] = v
-            for fn, v in self.enh_values[n]:
-                enh_flat[fn or ""][n] = v
-        if noisy:
-            return noisy_flat
-        return enh_flat
+        values = self.noisy_values if noisy else self.enh_values
+        flat: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for n, values_n in values.items():
+            for fn, v in values_n:
+                flat[fn or ""][n] = v
+        return dict(flat)
+
+    def to_frame(self, noisy: bool = False) -> "pd.DataFrame":
+        """DataFrame indexed by filename with one column per metric name."""
+        values = self.noisy_values if noisy else self.enh_values
+        columns = []
+        for n, values_n in values.items():
+            fns = pd.Index([fn or "" for fn in values_n.filenames], name="filename")
+            column = pd.Series(values_n.as_array(), index=fns, name=n)
+            # Same as in `flattend()`, the last value of a file wins
+            columns.append(column[~column.index.duplicated(keep="last")])
+        return pd.concat(columns, axis=1, sort=False)
 
 
 # Multiprocessing Metric
@@ -358,34 +918,58 @@ class MPMetric(Metric):
         pool: Pool,
         source_sr: Optional[int] = None,
         target_sr: Optional[int] = None,
+        worker: Optional[Callable] = None,
     ):
+        """A metric computed in a worker pool.
+
+        Args:
+            worker (Callable): Picklable function `worker(clean, degraded)` computing the metric.
+                Should be a module level function (or a partial of it) so that the metric object
+                itself does not need to be sent to the workers.
+        """
         super().__init__(name, source_sr=source_sr, target_sr=target_sr)
+        self.worker = worker
         self.pool = pool
         self.worker_results = deque()
         self.is_joined = False
+        # Pool callbacks are executed on the pool's result handler thread
+        self._lock = threading.Lock()
+
+    def _add_values_enh(self, values_enh: Union[float, np.ndarray], fn: Optional[str] = None):
+        with self._lock:
+            super()._add_values_enh(values_enh, fn)
+
+    def _add_values_noisy(self, values_noisy: Union[float, np.ndarray], fn: Optional[str] = None):
+        with self._lock:
+            super()._add_values_noisy(values_noisy, fn)
+
+    def compute_metric(self, clean, degraded) -> Union[float, np.ndarray]:
+        assert self.worker is not None
+        return self.worker(clean, degraded)
+
+    def add_result(self, values: Any, fn: Optional[str] = None, noisy: bool = False):
+        """Adds the result of a job computed via `run_metric_job()`."""
+        if isinstance(values, Exception):
+            logger.error(values)
+        elif noisy:
+            self._add_values_noisy(values, fn)
+        else:
+            self._add_values_enh(values, fn)
 
     def add(self, clean, enhanced, noisy=None, fn: Optional[str] = None):
-        assert clean.shape == enhanced.shape, f"{clean.shape}, {enhanced.shape}, {fn}"
-        if noisy is not None:
-            assert clean.shape == noisy.shape, f"{clean.shape}, {noisy.shape}, {fn}"
-        clean = self.maybe_resample(torch.as_tensor(clean)).squeeze(0)
-        enhanced = self.maybe_resample(torch.as_tensor(enhanced)).squeeze(0)
+        """Computes the metric of a sample asynchronously via `run_metric_job()`."""
+        (job,) = metric_jobs([self], clean, enhanced, noisy, fn=fn)
         h = self.pool.apply_async(
-            self.compute_metric,
-            (clean, enhanced),
-            callback=lambda x: self._add_values_enh(x, fn),
-            error_callback=logger.error,
+            run_metric_job, (job,), callback=self._add_job_result, error_callback=logger.error
         )
         self.worker_results.append(h)
-        if noisy is not None:
-            noisy = self.maybe_resample(torch.as_tensor(noisy)).squeeze(0)
-            h = self.pool.apply_async(
-                self.compute_metric,
-                (clean, noisy),
-                callback=lambda x: self._add_values_noisy(x, fn),
-                error_callback=logger.error,
-            )
-            self.worker_results.append(h)
+
+    def _add_job_result(self, result: MetricJobResult):
+        _, fn, results = result
+        for _, values_enh, values_noisy in results:
+            self.add_result(values_enh, fn)
+            if values_noisy is not None:
+                self.add_result(values_noisy, fn, noisy=True)
 
     def join_pool(self):
         if self.is_joined:
@@ -402,35 +986,30 @@ class MPMetric(Metric):
         self.join_pool()
         return super().flattend(noisy=noisy)
 
+    def to_frame(self, noisy: bool = False) -> "pd.DataFrame":
+        """DataFrame indexed by filename with one column per metric name."""
+        self.join_pool()
+        return super().to_frame(noisy=noisy)
+
     def mean(self) -> Dict[str, float]:
         self.join_pool()
         return super().mean()
 
-    def __getstate__(self):
-        self_dict = self.__dict__.copy()
-        del self_dict["pool"]
-        del self_dict["worker_results"]
-        return self_dict
-
-    def __setstate__(self, state):
-        self.__dict__.update(state)
-
 
 class SiSDRMetric(MPMetric):
     def __init__(self, pool: Pool):
-        super().__init__(name="SISDR", pool=pool)
-
-    def compute_metric(self, clean, degraded) -> float:
-        return si_sdr_speechmetrics(reference=as_numpy(clean), estimate=as_numpy(degraded))
+        super().__init__(name="SISDR", pool=pool, worker=_sisdr_worker)
 
 
 class StoiMetric(MPMetric):
     def __init__(self, sr: int, pool: Pool):
-        super().__init__(name="STOI", pool=pool, source_sr=sr, target_sr=10000)
-
-    def compute_metric(self, clean, degraded) -> float:
-        assert self.sr is not None
-        return stoi(clean=as_numpy(clean), degraded=as_numpy(degraded), sr=self.sr)
+        super().__init__(
+            name="STOI",
+            pool=pool,
+            source_sr=sr,
+            target_sr=10000,
+            worker=partial(_stoi_worker, sr=10000),
+        )
 
 
 class PesqMetric(MPMetric):
@@ -443,28 +1022,26 @@ class PesqMetric(MPMetric):
             name = "PESQ"
             self.mode = "wb"
             target_sr = 16000
-        super().__init__(name=name, pool=pool, source_sr=sr, target_sr=target_sr)
-
-    def compute_metric(self, clean, degraded) -> Union[float, np.ndarray]:
-        assert self.sr is not None
-        return pesq(self.sr, as_numpy(clean), as_numpy(degraded), self.mode)
+        super().__init__(
+            name=name,
+            pool=pool,
+            source_sr=sr,
+            target_sr=target_sr,
+            worker=partial(_pesq_worker, sr=target_sr, mode=self.mode),
+        )
 
 
 class CompositeMetric(MPMetric):
     def __init__(self, sr: int, pool: Pool, use_octave: bool = False):
         names = ["PESQ", "CSIG", "CBAK", "COVL", "SSNR"]
-        super().__init__(names, pool=pool, source_sr=sr, target_sr=16000)
-        self.use_octave = use_octave
-
-    def compute_metric(self, clean, degraded) -> Union[float, np.ndarray]:
-        assert self.sr is not None
-        c = composite(
-            clean=clean.squeeze(0),
-            degraded=degraded.squeeze(0),
-            sr=self.sr,
-            use_octave=self.use_octave,
+        super().__init__(
+            names,
+            pool=pool,
+            source_sr=sr,
+            target_sr=16000,
+            worker=partial(_composite_worker, sr=16000, use_octave=use_octave),
         )
-        return c
+        self.use_octave = use_octave
 
 
 class NoisyMetric(MPMetric):
@@ -491,30 +1068,88 @@ class NoisyMetric(MPMetric):
     def compute_metric(self, degraded) -> Union[float, np.ndarray]:
         pass
 
+    def __getstate__(self):
+        self_dict = self.__dict__.copy()
+        del self_dict["pool"]
+        del self_dict["worker_results"]
+        del self_dict["_lock"]
+        self_dict.pop("api_client", None)
+        return self_dict
 
-class DnsMosP808ApiMetric(NoisyMetric):
-    def __init__(self, sr: int, pool: Pool):
-        super().__init__(name="MOS", pool=pool, source_sr=sr, target_sr=16000)
-        self.url = "https://dnsmos.azurewebsites.net/score"
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class DnsMosApiMetric(NoisyMetric):
+    def __init__(
+        self,
+        name: Union[str, List[str]],
+        url: str,
+        sr: int,
+        pool: Pool,
+        api_client: Optional[DnsMosApiClient] = None,
+    ):
+        """DNSMOS metric computed via the web API.
+
+        Args:
+            api_client (DnsMosApiClient): Optional client to send the requests asynchronously.
+                If not provided, each request blocks one pool worker.
+        """
+        super().__init__(name=name, pool=pool, source_sr=sr, target_sr=16000)
+        self.url = url
         self.key = os.environ["DNS_AUTH_KEY"]
+        self.api_client = api_client
+
+    @abstractmethod
+    def parse_scores(self, score_dict: Dict[str, float]) -> Union[float, np.ndarray]:
+        pass
 
     def compute_metric(self, degraded) -> Union[float, np.ndarray]:
         assert self.sr is not None
-        score_dict = dnsmos_api_req(self.url, self.key, degraded)
+        return self.parse_scores(dnsmos_api_req(self.url, self.key, degraded))
+
+    def add(self, enhanced, noisy, fn: Optional[str] = None):
+        if self.api_client is None:
+            return super().add(enhanced, noisy, fn)
+        for x, add_values in ((enhanced, self._add_values_enh), (noisy, self._add_values_noisy)):
+            if x is None:
+                continue
+            self.api_client.submit(
+                self.url,
+                self.key,
+                self.maybe_resample(as_contiguous_f32(x)),
+                callback=partial(self._add_scores, add_values=add_values, fn=fn),
+                error_callback=logger.error,
+            )
+
+    def _add_scores(self, score_dict: Dict[str, float], add_values: Callable, fn: Optional[str]):
+        add_values(self.parse_scores(score_dict), fn)
+
+    def join_pool(self):
+        if self.api_client is not None:
+            self.api_client.join()
+        super().join_pool()
+
+
+class DnsMosP808ApiMetric(DnsMosApiMetric):
+    def __init__(self, sr: int, pool: Pool, api_client: Optional[DnsMosApiClient] = None):
+        super().__init__(name="MOS", url=URL_P808, sr=sr, pool=pool, api_client=api_client)
+
+    def parse_scores(self, score_dict: Dict[str, float]) -> Union[float, np.ndarray]:
         return float(score_dict["mos"])
 
 
-class DnsMosP835ApiMetric(NoisyMetric):
-    def __init__(self, sr: int, pool: Pool):
+class DnsMosP835ApiMetric(DnsMosApiMetric):
+    def __init__(self, sr: int, pool: Pool, api_client: Optional[DnsMosApiClient] = None):
         super().__init__(
-            name=["SIGMOS", "BAKMOS", "OVLMOS"], pool=pool, source_sr=sr, target_sr=16000
+            name=["SIGMOS", "BAKMOS", "OVLMOS"],
+            url=URL_P835,
+            sr=sr,
+            pool=pool,
+            api_client=api_client,
         )
-        self.url = "https://dnsmos.azurewebsites.net/v1/dnsmosp835/score"
-        self.key = os.environ["DNS_AUTH_KEY"]
 
-    def compute_metric(self, degraded) -> Union[float, np.ndarray]:
-        assert self.sr is not None
-        score_dict = dnsmos_api_req(self.url, self.key, degraded)
+    def parse_scores(self, score_dict: Dict[str, float]) -> Union[float, np.ndarray]:
         return np.asarray([float(score_dict[c]) for c in ("mos_sig", "mos_bak", "mos_ovr")])
 
 
@@ -530,11 +1165,29 @@ class DnsMosP835LocalMetric(NoisyMetric):
         return np.asarray(dnsmos_local(degraded, self.sig, self.bak_ovr))
 
 
+def _sisdr_worker(clean: np.ndarray, degraded: np.ndarray) -> float:
+    return si_sdr_speechmetrics(reference=clean, estimate=degraded)
+
+
+def _stoi_worker(clean: np.ndarray, degraded: np.ndarray, sr: int) -> float:
+    return stoi(clean=clean, degraded=degraded, sr=sr)
+
+
+def _pesq_worker(clean: np.ndarray, degraded: np.ndarray, sr: int, mode: str) -> float:
+    return pesq(sr, clean, degraded, mode)
+
+
+def _composite_worker(
+    clean: np.ndarray, degraded: np.ndarray, sr: int, use_octave: bool
+) -> np.ndarray:
+    return composite(clean=clean, degraded=degraded, sr=sr, use_octave=use_octave)
+
+
 def stoi(clean, degraded, sr, extended=False):
     assert len(clean.shape) == 1
     if sr != 10000:
-        clean = resample(torch.as_tensor(clean), sr, 10000, method=RESAMPLE_METHOD).numpy()
-        degraded = resample(torch.as_tensor(degraded), sr, 10000, method=RESAMPLE_METHOD).numpy()
+        clean = _resample(clean, sr, 10000).numpy()
+        degraded = _resample(degraded, sr, 10000).numpy()
         sr = 10000
     stoi = pystoi.stoi(x=clean, y=degraded, fs_sig=sr, extended=extended)
     return stoi
@@ -544,8 +1197,8 @@ def pesq_(
     clean: Union[np.ndarray, Tensor], degraded: Union[np.ndarray, Tensor], sr: int
 ) -> np.ndarray:
     if sr != 16000:
-        clean = resample(torch.as_tensor(clean), sr, 16000, method=RESAMPLE_METHOD).numpy()
-        degraded = resample(torch.as_tensor(degraded), sr, 16000, method=RESAMPLE_METHOD).numpy()
+        clean = _resample(clean, sr, 16000).numpy()
+        degraded = _resample(degraded, sr, 16000).numpy()
         sr = 16000
     return pesq(sr, as_numpy(clean).squeeze(), as_numpy(degraded).squeeze(), "wb")
 
@@ -556,8 +1209,8 @@ def composite(
     """Compute pesq, csig, cbak, covl, ssnr"""
     assert len(clean.shape) == 1, f"Input must be 1D array, but got input shape {clean.shape}"
     if sr != 16000:
-        clean = resample(torch.as_tensor(clean), sr, 16000, method=RESAMPLE_METHOD).numpy()
-        degraded = resample(torch.as_tensor(degraded), sr, 16000, method=RESAMPLE_METHOD).numpy()
+        clean = _resample(clean, sr, 16000).numpy()
+        degraded = _resample(degraded, sr, 16000).numpy()
         sr = 16000
     if use_octave:
         from tempfile import NamedTemporaryFile
@@ -579,25 +1232,54 @@ def si_sdr_speechmetrics(reference: np.ndarray, estimate: np.ndarray):
     # as provided by @Jonathan-LeRoux and slightly adapted for the case of just one reference
     # and one estimate.
     # see original code here: https://github.com/sigsep/bsseval/issues/3#issuecomment-494995846
-    reference = reference.reshape(-1, 1)
-    estimate = estimate.reshape(-1, 1)
-    eps = np.finfo(reference.dtype).eps
-    Rss = np.dot(reference.T, reference)
+    eps = float(np.finfo(reference.dtype).eps)
+    reference = np.ascontiguousarray(reference.ravel(), dtype=np.float64)
+    estimate = np.ascontiguousarray(estimate.ravel(), dtype=np.float64)
+    if not HAS_NUMBA:
+        return _sisdr_numpy(reference, estimate, eps)
+    return _sisdr_kernel(reference, estimate, eps)
+
+
+def _sisdr_numpy(ref: np.ndarray, est: np.ndarray, eps: float) -> float:
+    Rss = np.dot(ref, ref)
+    a = (eps + np.dot(ref, est)) / (Rss + eps)
+    e_res = est - a * ref
+    Sss = a * a * Rss
+    Snn = np.dot(e_res, e_res)
+    return 10 * np.log10((eps + Sss) / (eps + Snn))
+
+
+@njit(fastmath=True, cache=True)
+def _sisdr_kernel(ref: np.ndarray, est: np.ndarray, eps: float) -> float:
+    n = ref.shape[0]
+    Rss = 0.0
+    Rse = 0.0
+    for i in range(n):
+        Rss += ref[i] * ref[i]
+        Rse += ref[i] * est[i]
 
     # get the scaling factor for clean sources
-    a = (eps + np.dot(reference.T, estimate)) / (Rss + eps)
+    a = (eps + Rse) / (Rss + eps)
 
-    e_true = a * reference
-    e_res = estimate - e_true
+    # e_true = a * ref; e_res = est - e_true
+    Sss = a * a * Rss
+    Snn = 0.0
+    for i in range(n):
+        d = est[i] - a * ref[i]
+        Snn += d * d
 
-    Sss = (e_true**2).sum()
-    Snn = (e_res**2).sum()
-
-    sisdr = 10 * np.log10((eps + Sss) / (eps + Snn))
-    return sisdr
+    return 10 * np.log10((eps + Sss) / (eps + Snn))
 
 
 def as_numpy(x) -> np.ndarray:
     if isinstance(x, torch.Tensor):
         return x.cpu().detach().numpy()
     return x
+
+
+def as_contiguous_f32(x: Union[np.ndarray, Tensor]) -> np.ndarray:
+    """Converts an audio signal of shape [T] or [1, T] to a contiguous f32 array of shape [T]."""
+    x = as_numpy(x)
+    if x.ndim == 2 and x.shape[0] == 1:
+        x = x[0]
+    return np.ascontiguousarray(x, dtype=np.float32)
@@ -1,8 +1,12 @@
 import argparse
+import asyncio
 import json
 import os
+import threading
 import warnings
-from typing import Dict, List, Tuple
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Tuple
 
 import numpy as np
 import numpy.polynomial.polynomial as poly
@@ -18,6 +22,14 @@ try:
 except ImportError:
     requests = None
 
+try:
+    import aiohttp
+
+    HAS_AIOHTTP = True
+except ImportError:
+    aiohttp = None
+    HAS_AIOHTTP = False
+
 URL_P808 = "https://dnsmos.azurewebsites.net/score"
 URL_P835 = "https://dnsmos.azurewebsites.net/v1/dnsmosp835/score"
 URL_ONNX = "https://github.com/microsoft/DNS-Challenge/raw/6017eee40aaa39373c15fc897a600a3cfffc7133/DNSMOS/"
@@ -186,19 +198,27 @@ def dnsmos_local(
     return mod_sig, mod_bak, mod_ovr
 
 
-def dnsmos_api_req(url: str, key: str, audio: Tensor, verbose=False) -> Dict[str, float]:
-    assert requests is not None
+def _api_req_data(key: str, audio: Tensor) -> Tuple[str, Dict[str, str]]:
     # Set the content type
     headers = {"Content-Type": "application/json"}
     # If authentication is enabled, set the authorization header
     headers["Authorization"] = f"Basic {key}"
 
     data = {"data": audio.tolist(), "filename": "audio.wav"}
-    input_data = json.dumps(data)
+    return json.dumps(data), headers
+
 
-    tries = 0
-    timeout = 50
-    while True:
+def _api_req_timeouts(tries: int = 20, timeout: float = 50) -> Iterator[float]:
+    # Each retry doubles the timeout
+    for _ in range(tries):
+        yield timeout
+        timeout *= 2
+
+
+def dnsmos_api_req(url: str, key: str, audio: Tensor, verbose=False) -> Dict[str, float]:
+    assert requests is not None
+    input_data, headers = _api_req_data(key, audio)
+    for timeout in _api_req_timeouts():
         try:
             resp = requests.post(url, data=input_data, headers=headers, timeout=timeout)
             score_dict = resp.json()
@@ -208,11 +228,118 @@ def dnsmos_api_req(url: str, key: str, audio: Tensor, verbose=False) -> Dict[str
         except Exception as e:
             if verbose:
                 print(e)
-            tries += 1
-            timeout *= 2
-            if tries < 20:
-                continue
-            raise ValueError(f"Error gettimg mos {e}")
+            error = e
+    raise ValueError(f"Error gettimg mos {error}")
+
+
+async def dnsmos_api_req_async(
+    session, url: str, key: str, audio: Tensor, verbose=False
+) -> Dict[str, float]:
+    """Same as `dnsmos_api_req()` but using an `aiohttp.ClientSession`."""
+    assert aiohttp is not None
+    input_data, headers = _api_req_data(key, audio)
+    for timeout in _api_req_timeouts():
+        try:
+            async with session.post(
+                url,
+                data=input_data,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as resp:
+                score_dict = await resp.json(content_type=None)
+            if verbose:
+                log_metrics("DNSMOS", score_dict, level="DEBUG")
+            return score_dict
+        except Exception as e:
+            if verbose:
+                print(e)
+            error = e
+    raise ValueError(f"Error gettimg mos {error}")
+
+
+class DnsMosApiClient:
+    """Sends DNSMOS API requests concurrently from an event loop running in a background thread.
+
+    Args:
+        n_concurrent (int): Maximum number of requests in flight.
+        max_pending (int): Maximum number of submitted but not yet finished requests. `submit()`
+            blocks until a request finished if this number is exceeded.
+    """
+
+    def __init__(self, n_concurrent: int = 64, max_pending: int = 256):
+        assert aiohttp is not None, "DnsMosApiClient requires aiohttp"
+        self.n_concurrent = n_concurrent
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._init(), self.loop).result()
+
+    async def _init(self):
+        # Needs to be created within the running event loop
+        self.semaphore = asyncio.Semaphore(self.n_concurrent)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.n_concurrent)
+        )
+
+    async def _req(
+        self,
+        url: str,
+        key: str,
+        audio: Tensor,
+        callback: Callable[[Dict[str, float]], None],
+        error_callback: Callable[[BaseException], None],
+    ):
+        # The callbacks are executed within the request, so that the request is only finished
+        # once its result is processed. Errors of the callback are reported as well.
+        try:
+            async with self.semaphore:
+                score_dict = await dnsmos_api_req_async(self.session, url, key, audio)
+            callback(score_dict)
+        except Exception as e:
+            error_callback(e)
+
+    def submit(
+        self,
+        url: str,
+        key: str,
+        audio: Tensor,
+        callback: Callable[[Dict[str, float]], None],
+        error_callback: Callable[[BaseException], None],
+    ) -> Future:
+        while len(self.pending) >= self.max_pending:
+            self._wait(self.pending.popleft())
+        f = asyncio.run_coroutine_threadsafe(
+            self._req(url, key, audio, callback, error_callback), self.loop
+        )
+        self.pending.append(f)
+        return f
+
+    @staticmethod
+    def _wait(f: Future):
+        try:
+            f.result()
+        except Exception:
+            pass  # Already reported via error_callback
+
+    def join(self):
+        """Waits until all submitted requests are finished."""
+        while len(self.pending) > 0:
+            self._wait(self.pending.popleft())
+
+    def close(self):
+        self.join()
+        asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 def as_numpy(x) -> np.ndarray:
@@ -0,0 +1,375 @@
+import csv
+import threading
+from multiprocessing.dummy import Pool as DummyPool
+
+import numpy as np
+import pytest
+import torch
+from scipy.signal import sosfilt
+from torchaudio.functional import highpass_biquad
+
+from df import evaluation_utils
+from df.evaluation_utils import (
+    DnsMosP808ApiMetric,
+    MetricValues,
+    SharedArrays,
+    SiSDRMetric,
+    StftRoundTrip,
+    StoiMetric,
+    StreamingCsvWriter,
+    _highpass_sos,
+    _sisdr_kernel,
+    _sisdr_numpy,
+    compute_metrics,
+    evaluation_loop_dir_only,
+    metric_jobs,
+    run_metric_job,
+    si_sdr_speechmetrics,
+    stoi,
+    write_metrics_csv,
+)
+from df.io import save_audio
+from df.scripts import dnsmos
+from libdf import DF
+
+SR = 10000
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def get_samples(n: int, fn: str = "clean_0.wav", seed: int = 0):
+    """Noisy versions of the same clean signal which all share the file name `fn`."""
+    rng = np.random.default_rng(seed)
+    clean = rng.standard_normal(SR).astype(np.float32)
+    samples = []
+    for i in range(n):
+        enh = clean + (i + 1) * 0.2 * rng.standard_normal(SR).astype(np.float32)
+        samples.append((clean, enh, None, fn))
+    return samples
+
+
+def test_metric_values():
+    values = MetricValues()
+    assert np.isnan(values.mean())
+    values.append("a.wav", 1)
+    values.append("b.wav", 2.5)
+    assert len(values) == 2
+    assert values.mean() == 1.75
+    assert list(values) == [("a.wav", 1.0), ("b.wav", 2.5)]
+    # Values can still be appended while the returned array is alive
+    array = values.as_array()
+    values.append("c.wav", 3)
+    assert array.tolist() == [1.0, 2.5] and values.as_array().tolist() == [1.0, 2.5, 3.0]
+
+
+def test_streaming_csv_writer_repeated_filename(tmp_path):
+    with DummyPool(1) as pool:
+        metrics = [SiSDRMetric(pool=pool), StoiMetric(sr=SR, pool=pool)]
+    path = str(tmp_path / "enh.csv")
+    with StreamingCsvWriter(path, metrics) as writer:
+        # Interleaved results of two samples with the same file name
+        writer.add(metrics[0], 1.0, 0, "a.wav")
+        writer.add(metrics[0], 2.0, 1, "a.wav")
+        writer.add(metrics[1], 0.2, 1, "a.wav")
+        writer.add(metrics[1], ValueError("failed"), 0, "a.wav")
+        writer.add(metrics[0], 3.0, 2, "b.wav")
+    rows = read_csv(path)
+    assert rows[0] == ["filename", "SISDR", "STOI"]
+    assert rows[1:] == [["a.wav", "2.0", "0.2"], ["a.wav", "1.0", ""], ["b.wav", "3.0", ""]]
+
+
+def test_streaming_csv_writer_metric_order(tmp_path):
+    with DummyPool(1) as pool:
+        metrics = [SiSDRMetric(pool=pool), StoiMetric(sr=SR, pool=pool), SiSDRMetric(pool=pool)]
+    path = str(tmp_path / "enh.csv")
+    with StreamingCsvWriter(path, metrics) as writer:
+        # Metrics with the same value name, e.g. PESQ of pesq and composite. The last one wins,
+        # independent of the completion order.
+        for m, value in ((2, 3.0), (1, 0.5), (0, 1.0)):
+            writer.add(metrics[m], value, 0, "a.wav")
+        for m, value in ((0, 1.0), (2, 3.0), (1, 0.5)):
+            writer.add(metrics[m], value, 1, "b.wav")
+    rows = read_csv(path)
+    assert rows == [["filename", "SISDR", "STOI"], ["a.wav", "3.0", "0.5"], ["b.wav", "3.0", "0.5"]]
+
+
+def test_compute_metrics_repeated_filename(tmp_path):
+    samples = get_samples(6)
+    path = str(tmp_path / "enh.csv")
+    with DummyPool(2) as pool:
+        metrics = [SiSDRMetric(pool=pool), StoiMetric(sr=SR, pool=pool)]
+        compute_metrics(pool, metrics, samples, chunksize=1, csv_path_enh=path)
+    rows = read_csv(path)
+    assert rows[0] == ["filename", "SISDR", "STOI"]
+    assert len(rows) == len(samples) + 1
+    expected = {
+        (si_sdr_speechmetrics(clean, enh), stoi(clean, enh, SR)) for clean, enh, _, _ in samples
+    }
+    for fn, sisdr, stoi_ in rows[1:]:
+        assert fn == "clean_0.wav"
+        # Each row needs to contain the metrics of the same sample
+        assert any(
+            np.isclose(float(sisdr), e[0]) and np.isclose(float(stoi_), e[1]) for e in expected
+        )
+    assert len(metrics[0].enh_values["SISDR"]) == len(samples)
+
+
+def test_shared_arrays_repeated_filename():
+    samples = get_samples(2)
+    with DummyPool(1) as pool:
+        metrics = [SiSDRMetric(pool=pool), StoiMetric(sr=SR, pool=pool)]
+    with SharedArrays() as shared:
+        jobs = [
+            shared.share_jobs(list(metric_jobs(metrics, *sample[:3], fn=sample[3], sample_idx=i)))
+            for i, sample in enumerate(samples)
+        ]
+        # Each sample has its own blocks, even though the inputs share the same file name
+        assert len(shared.blocks[0]) == len(shared.blocks[1]) == 2
+        for job in jobs[0]:
+            sample_idx, _, results = run_metric_job(job)
+            assert sample_idx == 0
+            for _, values_enh, values_noisy in results:
+                assert not isinstance(values_enh, Exception) and values_noisy is None
+            shared.job_done(sample_idx)
+        assert 0 not in shared.blocks and len(shared.blocks[1]) == 2
+        for job in jobs[1]:
+            shared.job_done(run_metric_job(job)[0])
+        assert len(shared.blocks) == 0 and len(shared.pending) == 0
+
+
+def test_shared_arrays_max_pending():
+    samples = get_samples(3)
+    with DummyPool(1) as pool:
+        metrics = [SiSDRMetric(pool=pool)]
+    jobs = [
+        list(metric_jobs(metrics, *sample[:3], sample_idx=i)) for i, sample in enumerate(samples)
+    ]
+    with SharedArrays(max_pending=2) as shared:
+        shared.share_jobs(jobs[0])
+        shared.share_jobs(jobs[1])
+        producer = threading.Thread(target=shared.share_jobs, args=(jobs[2],))
+        producer.start()
+        # The third sample waits until one of the first two samples is done
+        producer.join(timeout=0.2)
+        assert producer.is_alive() and 2 not in shared.pending
+        shared.job_done(0)
+        producer.join(timeout=5)
+        assert not producer.is_alive() and sorted(shared.pending) == [1, 2]
+
+
+def test_compute_metrics_bounded_shared_memory(monkeypatch):
+    n_live, max_live = 0, 0
+    share, unlink = SharedArrays._share, SharedArrays._unlink
+
+    def share_counted(self, arr, sample_idx):
+        nonlocal n_live, max_live
+        n_live += 1
+        max_live = max(max_live, n_live)
+        return share(self, arr, sample_idx)
+
+    def unlink_counted(blocks):
+        nonlocal n_live
+        n_live -= len(blocks)
+        unlink(blocks)
+
+    monkeypatch.setattr(evaluation_utils.SharedArrays, "_share", share_counted)
+    monkeypatch.setattr(evaluation_utils.SharedArrays, "_unlink", staticmethod(unlink_counted))
+    samples = get_samples(40)
+    with DummyPool(2) as pool:
+        metrics = [SiSDRMetric(pool=pool)]
+        compute_metrics(
+            pool, metrics, samples, use_shared_memory=True, chunksize=1, max_pending_samples=3
+        )
+    assert len(metrics[0].enh_values["SISDR"]) == len(samples)
+    # Clean and enhanced blocks of at most 3 samples
+    assert n_live == 0 and max_live <= 6
+
+
+def test_evaluation_loop_dir_only_repeated_clean_file(tmp_path):
+    sr = 16000
+    rng = np.random.default_rng(0)
+    clean = 0.1 * rng.standard_normal(sr).astype(np.float32)
+    clean_files, enh_files, noisy_files = [], [], []
+    for i in range(6):
+        noisy = clean + 0.05 * (i + 1) * rng.standard_normal(sr).astype(np.float32)
+        enh = clean + 0.02 * (i + 1) * rng.standard_normal(sr).astype(np.float32)
+        clean_files.append(str(tmp_path / "clean_0.wav"))
+        enh_files.append(str(tmp_path / f"enh_{i}.wav"))
+        noisy_files.append(str(tmp_path / f"noisy_{i}.wav"))
+        save_audio(enh_files[-1], enh, sr, dtype=torch.float32)
+        save_audio(noisy_files[-1], noisy, sr, dtype=torch.float32)
+    save_audio(clean_files[0], clean, sr, dtype=torch.float32)
+    csv_enh, csv_noisy = str(tmp_path / "enh.csv"), str(tmp_path / "noisy.csv")
+    evaluation_loop_dir_only(
+        clean_files,
+        enh_files,
+        noisy_files,
+        metrics=["sisdr", "stoi"],
+        n_workers=2,
+        csv_path_enh=csv_enh,
+        csv_path_noisy=csv_noisy,
+        chunksize=1,
+    )
+    for path in (csv_enh, csv_noisy):
+        rows = read_csv(path)
+        assert rows[0] == ["filename", "SISDR", "STOI"]
+        assert len(rows) == len(clean_files) + 1
+        # SI-SDR and STOI decrease with the noise level, thus their ranks must match per row
+        sisdr = np.array([float(r[1]) for r in rows[1:]])
+        stoi_ = np.array([float(r[2]) for r in rows[1:]])
+        np.testing.assert_array_equal(np.argsort(sisdr), np.argsort(stoi_))
+
+
+class StubApiClient:
+    """Replies to each DNSMOS request with the length of the submitted audio."""
+
+    def __init__(self):
+        self.audio = []
+
+    def submit(self, url, key, audio, callback, error_callback):
+        self.audio.append(audio)
+        callback({"mos": float(len(audio))})
+
+    def join(self):
+        pass
+
+
+def test_dnsmos_api_metric_api_client(monkeypatch):
+    monkeypatch.setenv("DNS_AUTH_KEY", "key")
+    client = StubApiClient()
+    with DummyPool(1) as pool:
+        metric = DnsMosP808ApiMetric(sr=48000, pool=pool, api_client=client)
+        enh, noisy = np.zeros(48000, dtype=np.float32), np.ones(48000, dtype=np.float32)
+        metric.add(enh, noisy, fn="a.wav")
+        metric.add(enh[None], None, fn="b.wav")
+        assert all(audio.shape == (16000,) for audio in client.audio)
+        assert metric.mean() == {"Noisy    MOS": 16000.0, "Enhanced MOS": 16000.0}
+        assert len(metric.enh_values["MOS"]) == 2
+
+
+def test_run_metric_job_noisy():
+    sr = 16000
+    rng = np.random.default_rng(0)
+    clean = rng.standard_normal(sr).astype(np.float32)
+    enh = clean + 0.2 * rng.standard_normal(sr).astype(np.float32)
+    noisy = clean + rng.standard_normal(sr).astype(np.float32)
+    with DummyPool(1) as pool:
+        metrics = [StoiMetric(sr=sr, pool=pool), SiSDRMetric(pool=pool), StoiMetric(sr, pool)]
+    # Metrics with the same sampling rates share a job and thus the resampled inputs
+    jobs = list(metric_jobs(metrics, clean, enh, noisy, fn="a.wav", sample_idx=3))
+    assert [job[0] for job in jobs] == [(0, 2), (1,)]
+    sample_idx, fn, results = run_metric_job(jobs[0])
+    assert (sample_idx, fn) == (3, "a.wav")
+    assert [r[0] for r in results] == [0, 2]
+    for _, values_enh, values_noisy in results:
+        np.testing.assert_allclose(values_enh, stoi(clean, enh, sr), rtol=1e-5)
+        np.testing.assert_allclose(values_noisy, stoi(clean, noisy, sr), rtol=1e-5)
+        assert values_noisy < values_enh
+
+
+def test_mp_metric_add():
+    samples = get_samples(3)
+    with DummyPool(2) as pool:
+        metric = SiSDRMetric(pool=pool)
+        for i, (clean, enh, _, _) in enumerate(samples):
+            metric.add(clean, enh, noisy=clean if i == 0 else None, fn=f"{i}.wav")
+        mean = metric.mean()
+    expected = np.mean([si_sdr_speechmetrics(clean, enh) for clean, enh, _, _ in samples])
+    np.testing.assert_allclose(mean["Enhanced SISDR"], expected)
+    assert len(metric.enh_values["SISDR"]) == 3 and len(metric.noisy_values["SISDR"]) == 1
+
+
+def test_dnsmos_api_client_callback_errors(monkeypatch):
+    pytest.importorskip("aiohttp")
+
+    async def api_req(session, url, key, audio):
+        if len(audio) == 0:
+            raise ValueError("Empty audio")
+        return {"mos": float(len(audio))} if url == "p808" else {"error": "Invalid request"}
+
+    monkeypatch.setattr(dnsmos, "dnsmos_api_req_async", api_req)
+    results, errors = [], []
+
+    def callback(score_dict):
+        results.append(float(score_dict["mos"]))
+
+    with dnsmos.DnsMosApiClient(n_concurrent=2, max_pending=2) as client:
+        for url, n in (("p808", 10), ("p835", 10), ("p808", 0), ("p808", 20)):
+            client.submit(url, "key", np.zeros(n), callback, errors.append)
+        client.join()
+        # All callbacks are finished once join() returns
+        assert sorted(results) == [10.0, 20.0]
+        assert sorted(type(e).__name__ for e in errors) == ["KeyError", "ValueError"]
+
+
+def test_write_metrics_csv_duplicate_names(tmp_path):
+    pytest.importorskip("pandas")
+    with DummyPool(1) as pool:
+        metrics = [SiSDRMetric(pool=pool), StoiMetric(sr=SR, pool=pool), SiSDRMetric(pool=pool)]
+    for i, fn in enumerate(("a.wav", "b.wav")):
+        metrics[0]._add_values_enh(float(i), fn)
+        metrics[1]._add_values_enh(i / 2, fn)
+        metrics[2]._add_values_enh(float(i + 10), fn)
+    for legacy in (False, True):
+        path = str(tmp_path / f"enh_{legacy}.csv")
+        metrics_ = metrics if not legacy else [metrics[1], metrics[0], metrics[2]]
+        write_metrics_csv(path, metrics_, legacy=legacy)
+        rows = read_csv(path)
+        assert sorted(rows[0]) == ["SISDR", "STOI", "filename"]
+        rows = {r[0]: dict(zip(rows[0][1:], r[1:])) for r in rows[1:]}
+        assert rows["b.wav"] == {"SISDR": "11.0", "STOI": "0.5"}
+
+
+def test_stft_round_trip():
+    df_state = DF(sr=48000, fft_size=960, hop_size=480, nb_bands=32)
+    round_trip = StftRoundTrip(df_state)
+    assert round_trip.is_linear
+    rng = np.random.default_rng(0)
+    for n in (48000, 48000 + 123):
+        x = rng.standard_normal((1, n)).astype(np.float32)
+        exact = df_state.synthesis(df_state.analysis(x))
+        np.testing.assert_allclose(round_trip(x), exact, rtol=1e-4, atol=1e-5)
+
+
+def si_sdr_reference(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """Original implementation adopted from speechmetrics."""
+    reference = reference.reshape(-1, 1)
+    estimate = estimate.reshape(-1, 1)
+    eps = np.finfo(reference.dtype).eps
+    Rss = np.dot(reference.T, reference)
+    a = (eps + np.dot(reference.T, estimate)) / (Rss + eps)
+    e_true = a * reference
+    e_res = estimate - e_true
+    Sss = (e_true**2).sum()
+    Snn = (e_res**2).sum()
+    return 10 * np.log10((eps + Sss) / (eps + Snn))
+
+
+def test_si_sdr():
+    rng = np.random.default_rng(0)
+    for noise_level in (0.01, 0.3, 1.0, 3.0):
+        clean = rng.standard_normal(48000).astype(np.float32)
+        est = clean + noise_level * rng.standard_normal(48000).astype(np.float32)
+        expected = si_sdr_reference(clean, est)
+        eps = float(np.finfo(np.float32).eps)
+        ref64, est64 = clean.astype(np.float64), est.astype(np.float64)
+        # Dispatching function, fused numba kernel and the numpy fallback used without numba
+        for value in (
+            si_sdr_speechmetrics(clean, est),
+            _sisdr_kernel(ref64, est64, eps),
+            _sisdr_numpy(ref64, est64, eps),
+        ):
+            np.testing.assert_allclose(value, expected, atol=1e-4)
+
+
+def test_highpass_sos():
+    rng = np.random.default_rng(0)
+    # Exceeds [-1, 1] in parts to test the clamping as well
+    x = 0.5 * rng.standard_normal((1, 48000)).astype(np.float32)
+    for sr, cutoff_freq in ((48000, 100), (16000, 200)):
+        y = np.clip(sosfilt(_highpass_sos(sr, cutoff_freq), x), -1.0, 1.0)
+        expected = highpass_biquad(torch.from_numpy(x), sr, cutoff_freq=cutoff_freq).numpy()
+        np.testing.assert_allclose(y, expected, atol=2e-4)